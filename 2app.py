@@ -1,39 +1,46 @@
+import re
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
 
 # Set page config
 st.set_page_config(page_title="Hidden Gems Finder", layout="wide")
 
 @st.cache_data
 def load_data():
-    df = pd.read_csv('gems_with_coordinates.csv')
+    # Only parse the columns the app uses; dtypes for the ones that never need cleaning
+    usecols = [
+        'Institution Name', 'Acceptance Rate 2022 (IPEDS)', 'Earnings-to-Price Ratio (Itzkowitz)',
+        '6 Year Grad Rate 2022 (IPEDS)', 'Control of institution (IPEDS)', 'City location of institution (HD2022)',
+        'State abbreviation (HD2022)', 'Average net price over four years (Itkowitz)', 'Yield Rate 2022 (IPEDS)',
+        'Latitude', 'Longitude'
+    ]
+    dtypes = {
+        'Control of institution (IPEDS)': 'Int8',
+        'City location of institution (HD2022)': 'category',
+        'State abbreviation (HD2022)': 'category',
+        # float32 is still ~1 m precise for coordinates and halves the arrays sent to the map
+        'Latitude': 'float32',
+        'Longitude': 'float32'
+    }
+    df = pd.read_csv('gems_with_coordinates.csv', usecols=usecols, dtype=dtypes)
     
-    # Function to convert percentage strings to floats
-    def convert_percentage(value):
-        if isinstance(value, str):
-            return float(value.strip('%')) / 100
-        return value
-
-    # Function to convert to float, handling non-numeric strings
-    def safe_float(value):
-        if pd.isna(value):
-            return np.nan
-        try:
-            return float(value.replace('$', '').replace(',', ''))
-        except (ValueError, AttributeError):
-            return np.nan
+    # Convert percentage strings to floats (columns already parsed as numbers are left as-is)
+    def _pct(s):
+        if pd.api.types.is_numeric_dtype(s):
+            return s
+        return pd.to_numeric(s.astype('string').str.rstrip('%'), errors='coerce').astype('float64') / 100.0
 
     # Convert percentages to floats and handle potential string values
-    percentage_columns = ['Acceptance Rate 2022 (IPEDS)', '6 Year Grad Rate 2022 (IPEDS)', 'FTFT Grad Rate (6 Years) 2015-2016 Cohort (Bain)', 'Yield Rate 2022 (IPEDS)']
+    percentage_columns = ['Acceptance Rate 2022 (IPEDS)', '6 Year Grad Rate 2022 (IPEDS)', 'Yield Rate 2022 (IPEDS)']
     for col in percentage_columns:
         if col in df.columns:
-            df[col] = df[col].apply(convert_percentage)
+            df[col] = _pct(df[col])
     
     # Handle 'Average net price over four years (Itkowitz)' separately
     if 'Average net price over four years (Itkowitz)' in df.columns:
-        df['Average net price over four years (Itkowitz)'] = df['Average net price over four years (Itkowitz)'].apply(safe_float)
+        net_price = df['Average net price over four years (Itkowitz)'].astype('string').str.replace(r'[$,]', '', regex=True)
+        df['Average net price over four years (Itkowitz)'] = pd.to_numeric(net_price, errors='coerce').astype('float64')
     
     # Ensure 'Earnings-to-Price Ratio (Itzkowitz)' is float without modifying its format
     if 'Earnings-to-Price Ratio (Itzkowitz)' in df.columns:
@@ -54,83 +61,70 @@ def load_data():
     
     df = df.rename(columns={old: new for old, new in column_mapping.items() if old in df.columns})
     
-    # Create Public/Private column
-    df['Institution Type'] = df['Control'].map({1: 'Public', 2: 'Private'})
+    # Lowercased names for case-insensitive search, computed once here instead of on every rerun
+    df['_name_lc'] = df['Name'].str.lower().fillna('')
+    
+    # Rows that can be placed on the map (fixed by the CSV, so worked out once here)
+    df['_has_coord'] = df['Latitude'].notna() & df['Longitude'].notna()
+    
+    # Create Public/Private column (Control 1/2 become category codes 0/1; anything else is missing)
+    codes = (df['Control'] - 1).where(df['Control'].isin([1, 2]), -1).astype('int8')
+    df['Institution Type'] = pd.Categorical.from_codes(codes, categories=['Public', 'Private'])
+    
+    # State and City are read as category; do the same for Control
+    df['Control'] = df['Control'].astype('category')
+    
+    # Downcast unfiltered numerics to float32. Columns compared against slider bounds
+    # stay float64 so values like 0.3 don't slip past the edges
+    for col in ['Four Year Cost', 'Yield Rate']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='float')
     
     # Print data types and some statistics for debugging
     print(df.dtypes)
     print(df['Earnings to Price Ratio'].describe())
     
-    return df
-
-# Load the data
-try:
-    df = load_data()
-except Exception as e:
-    st.error(f"Error loading data: {str(e)}")
-    st.stop()
-
-# Main layout
-st.title('Hidden Gems Finder')
-st.write('Discover potential gem colleges across the United States.')
-
-# Sidebar for filters
-st.sidebar.header('Filters')
-
-# Sliders for filtering
-admission_rate = st.sidebar.slider('Admission Rate', 0.0, 1.0, (0.0, 1.0))
-graduation_rate = st.sidebar.slider('Graduation Rate', 0.0, 1.0, (0.0, 1.0))
-
-# Handle Earnings to Price Ratio
-earnings_ratio_values = df['Earnings to Price Ratio'].dropna()
-if len(earnings_ratio_values) > 0:
-    earnings_ratio_min = float(earnings_ratio_values.min())
-    earnings_ratio_max = min(float(earnings_ratio_values.max()), 10.0)  # Cap at 2.0
-    earnings_ratio = st.sidebar.slider('Earnings to Price Ratio', 
-                                       earnings_ratio_min, 
-                                       earnings_ratio_max, 
-                                       (earnings_ratio_min, earnings_ratio_max))
-else:
-    st.sidebar.warning("No valid Earnings to Price Ratio data available.")
-    earnings_ratio = (0, 2)  # Default range if no valid data
-
-# Search box
-search_term = st.sidebar.text_input('Search for an institution')
-
-# Filter the dataframe
-filtered_df = df[
-    (df['Admission Rate'].between(admission_rate[0], admission_rate[1], inclusive='both')) &
-    (df['Graduation Rate'].between(graduation_rate[0], graduation_rate[1], inclusive='both')) &
-    (
-        (df['Earnings to Price Ratio'].between(earnings_ratio[0], earnings_ratio[1], inclusive='both')) |
-        (df['Earnings to Price Ratio'].isna())  # Include NaN values
-    ) &
-    (df['Name'].str.contains(search_term, case=False, na=False))
-]
+    # Slider bounds for Earnings to Price Ratio (None when there's no valid data)
+    earnings_ratio_values = df['Earnings to Price Ratio'].dropna()
+    if len(earnings_ratio_values) > 0:
+        earnings_ratio_min = float(earnings_ratio_values.min())
+        earnings_ratio_max = min(float(earnings_ratio_values.max()), 10.0)  # Cap at 10.0
+    else:
+        earnings_ratio_min = earnings_ratio_max = None
+    
+    return df, earnings_ratio_min, earnings_ratio_max
 
+# Maximum number of markers drawn on the map
+MAP_LIMIT = 5000
 
-# Add a debug print statement
-st.sidebar.write(f"Number of colleges after filtering: {len(filtered_df)}")
+# Search terms without regex metacharacters are matched as plain substrings (much faster than re)
+REGEX_CHARS = re.compile(r'[.^$*+?{}\[\]\\|()]')
 
-# Toggle for map visibility
-show_map = st.checkbox('Show Map', value=True)
-
-if show_map and not filtered_df.empty:
-    # Map visualization
-    st.subheader('College Locations')
+def search_names(df, search_term):
+    if REGEX_CHARS.search(search_term):
+        try:
+            return df['Name'].str.contains(re.compile(search_term, re.IGNORECASE), na=False)
+        except re.error:
+            pass  # Not a valid pattern, fall back to a literal match
+    # Literal match against the lowercased names cached by load_data
+    return df['_name_lc'].str.contains(search_term.lower(), regex=False, na=False)
 
+# Build the map figure; cached on map_sig (a digest of the filtered rows), _map_df itself is not hashed.
+# The cache is shared across sessions, so it's bounded to the most recent filter sets
+@st.cache_data(max_entries=32)
+def build_map_fig(map_sig, _map_df):
     # Create a color map for public/private institutions
     color_map = {'Public': 'orange', 'Private': 'green'}
 
-    # Filter out rows with missing lat/long
-    map_df = filtered_df.dropna(subset=['Latitude', 'Longitude'])
-
-    fig = px.scatter_mapbox(map_df, 
+    fig = px.scatter_mapbox(_map_df, 
                             lat='Latitude', 
                             lon='Longitude', 
                             hover_name='Name', 
                             color='Institution Type',
                             color_discrete_map=color_map,
+                            # px splits this per Institution Type trace and passes it on as arrays
+                            custom_data=['City', 'State', 'Institution Type', 'Admission Rate',
+                                         'Earnings to Price Ratio', 'Graduation Rate', 'Four Year Cost', 'Yield Rate'],
                             zoom=3, 
                             height=600)
 
@@ -150,11 +144,88 @@ if show_map and not filtered_df.empty:
                     "Yield Rate: %{customdata[7]:.0%}<br>" + \
                     "<extra></extra>"
 
-    fig.update_traces(
-        hovertemplate=hovertemplate,
-        customdata=map_df[['City', 'State', 'Institution Type', 'Admission Rate', 
-                           'Earnings to Price Ratio', 'Graduation Rate', 'Four Year Cost', 'Yield Rate']]
-    )
+    fig.update_traces(hovertemplate=hovertemplate)
+
+    return fig
+
+# Load the data
+try:
+    df, earnings_ratio_min, earnings_ratio_max = load_data()
+except Exception as e:
+    st.error(f"Error loading data: {str(e)}")
+    st.stop()
+
+# Main layout
+st.title('Hidden Gems Finder')
+st.write('Discover potential gem colleges across the United States.')
+
+# Sidebar for filters
+st.sidebar.header('Filters')
+
+# Filters are grouped in a form so dragging a slider or typing in the search box
+# doesn't rerun the whole app until Apply is pressed
+with st.sidebar.form('filters'):
+    # Sliders for filtering
+    admission_rate = st.slider('Admission Rate', 0.0, 1.0, (0.0, 1.0))
+    graduation_rate = st.slider('Graduation Rate', 0.0, 1.0, (0.0, 1.0))
+
+    # Handle Earnings to Price Ratio
+    if earnings_ratio_min is not None:
+        earnings_ratio = st.slider('Earnings to Price Ratio', 
+                                   earnings_ratio_min, 
+                                   earnings_ratio_max, 
+                                   (earnings_ratio_min, earnings_ratio_max))
+    else:
+        st.warning("No valid Earnings to Price Ratio data available.")
+        earnings_ratio = (0, 2)  # Default range if no valid data
+
+    # Search box
+    search_term = st.text_input('Search for an institution')
+
+    st.form_submit_button('Apply')
+
+# Filter the dataframe
+# Apply the search first (when set) so the numeric bounds only run on the matching rows.
+# The numeric bounds are fused into a single eval (numexpr-backed when installed)
+filtered_df = df
+if search_term:
+    filtered_df = filtered_df[search_names(filtered_df, search_term)]
+num_mask = filtered_df.eval(
+    "(`Admission Rate` >= @admission_rate[0]) & (`Admission Rate` <= @admission_rate[1]) & "
+    "(`Graduation Rate` >= @graduation_rate[0]) & (`Graduation Rate` <= @graduation_rate[1]) & "
+    "(((`Earnings to Price Ratio` >= @earnings_ratio[0]) & (`Earnings to Price Ratio` <= @earnings_ratio[1])) | "
+    "(`Earnings to Price Ratio` != `Earnings to Price Ratio`))"  # NaN != NaN, so this keeps missing ratios
+)
+filtered_df = filtered_df[num_mask]
+
+
+# Add a debug print statement
+st.sidebar.write(f"Number of colleges after filtering: {len(filtered_df)}")
+
+# Toggle for map visibility
+show_map = st.checkbox('Show Map', value=True)
+
+if show_map and not filtered_df.empty:
+    # Map visualization
+    st.subheader('College Locations')
+
+    # The plotted rows only depend on filtered_df, so reuse the last figure while its rows are unchanged
+    map_sig = int(pd.util.hash_pandas_object(filtered_df.index, index=False).sum())
+    if st.session_state.get('map_sig') != map_sig or 'map_fig' not in st.session_state:
+        # Filter out rows with missing lat/long
+        map_df = filtered_df[filtered_df['_has_coord']]
+        st.session_state['map_total'] = len(map_df)
+
+        # Keep the map responsive for large result sets by plotting a deterministic sample
+        if len(map_df) > MAP_LIMIT:
+            map_df = map_df.sample(n=MAP_LIMIT, random_state=0)
+
+        st.session_state['map_fig'] = build_map_fig(map_sig, map_df)
+        st.session_state['map_sig'] = map_sig
+    fig = st.session_state['map_fig']
+
+    if st.session_state['map_total'] > MAP_LIMIT:
+        st.info(f"Showing {MAP_LIMIT} of {st.session_state['map_total']} locations on the map. Refine the filters to see them all.")
 
     st.plotly_chart(fig, use_container_width=True)
 elif show_map:
@@ -166,27 +237,25 @@ st.subheader('College Data')
 # Main table with all metrics
 main_columns = ['Name', 'City', 'State', 'Institution Type', 'Admission Rate', 'Earnings to Price Ratio', 
                 'Graduation Rate', 'Four Year Cost', 'Yield Rate']
-st.dataframe(filtered_df[main_columns].style.format({
-    'Admission Rate': '{:.0%}',
-    'Graduation Rate': '{:.0%}',
-    'Earnings to Price Ratio': '{:.2f}',
-    'Four Year Cost': '${:,.0f}',
-    'Yield Rate': '{:.0%}'
-}))
-
-# Display filtered out colleges
-filtered_out_df = df[~df.index.isin(filtered_df.index)]
+# Formatting is applied client-side by the grid instead of per cell through pandas Styler
+# (step=0.01 makes the percent format show whole percentages)
+column_config = {
+    'Admission Rate': st.column_config.NumberColumn(format='percent', step=0.01),
+    'Graduation Rate': st.column_config.NumberColumn(format='percent', step=0.01),
+    'Earnings to Price Ratio': st.column_config.NumberColumn(format='%.2f'),
+    'Four Year Cost': st.column_config.NumberColumn(format='$%,.0f'),
+    'Yield Rate': st.column_config.NumberColumn(format='percent', step=0.01)
+}
+st.dataframe(filtered_df[main_columns], column_config=column_config)
+
+# Display filtered out colleges (only built on request, the expander body runs on every rerun)
 with st.expander("Filtered Out Colleges"):
-    st.dataframe(filtered_out_df[main_columns].style.format({
-        'Admission Rate': '{:.0%}',
-        'Graduation Rate': '{:.0%}',
-        'Earnings to Price Ratio': '{:.2f}',
-        'Four Year Cost': '${:,.0f}',
-        'Yield Rate': '{:.0%}'
-    }))
+    if st.checkbox('Load filtered-out table', value=False):
+        filtered_out_df = df.drop(filtered_df.index)
+        st.dataframe(filtered_out_df[main_columns], column_config=column_config)
 
 # Add debug information
 st.sidebar.write("Debug Information:")
 st.sidebar.write(f"Total colleges: {len(df)}")
 st.sidebar.write(f"Displayed colleges: {len(filtered_df)}")
-st.sidebar.write(f"Filtered out colleges: {len(filtered_out_df)}")
\ No newline at end of file
+st.sidebar.write(f"Filtered out colleges: {len(df) - len(filtered_df)}")
\ No newline at end of file
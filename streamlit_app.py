@@ -1,5 +1,7 @@
+import re
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 
 # Set page config
@@ -7,7 +9,21 @@ st.set_page_config(page_title="Accessible Excellence Explorer", layout="wide")
 
 @st.cache_data
 def load_data():
-    df = pd.read_csv('accessible_excellence.csv')
+    # Only parse the columns the app uses
+    usecols = [
+        'Institution Name', 'City location of institution (HD2022)', 'State abbreviation (HD2022)',
+        'Control of institution (IPEDS)', 'Fit Rating for Accessible Excellence List', 'Latitude', 'Longitude'
+    ]
+    dtypes = {
+        'City location of institution (HD2022)': 'category',
+        'State abbreviation (HD2022)': 'category',
+        'Control of institution (IPEDS)': 'Int8',
+        'Fit Rating for Accessible Excellence List': 'category',
+        # float32 is still ~1 m precise for coordinates and halves the arrays sent to the map
+        'Latitude': 'float32',
+        'Longitude': 'float32'
+    }
+    df = pd.read_csv('accessible_excellence.csv', usecols=usecols, dtype=dtypes)
     
     # Rename columns for clarity
     column_mapping = {
@@ -20,14 +36,99 @@ def load_data():
     
     df = df.rename(columns={old: new for old, new in column_mapping.items() if old in df.columns})
     
-    # Create Public/Private column
-    df['Institution Type'] = df['Control'].map({1: 'Public', 2: 'Private'})
+    # Lowercased names for case-insensitive search, computed once here instead of on every rerun
+    df['_name_lc'] = df['Name'].str.lower().fillna('')
+    
+    # Rows that can be placed on the map (fixed by the CSV, so worked out once here)
+    df['_has_coord'] = df['Latitude'].notna() & df['Longitude'].notna()
+    
+    # Create Public/Private column (Control 1/2 become category codes 0/1; anything else is missing)
+    codes = (df['Control'] - 1).where(df['Control'].isin([1, 2]), -1).astype('int8')
+    df['Institution Type'] = pd.Categorical.from_codes(codes, categories=['Public', 'Private'])
     
-    return df
+    # State, City and Fit Rating are read as category; do the same for Control
+    df['Control'] = df['Control'].astype('category')
+    
+    # Options for the sidebar filters, fixed by the data so computed once here
+    fit_ratings = tuple(df['Fit Rating'].dropna().unique())
+    institution_types = tuple(df['Institution Type'].dropna().unique())
+    states = tuple(sorted(df['State'].dropna().unique().tolist()))
+    
+    return df, fit_ratings, institution_types, states
+
+# Maximum number of markers drawn on the map
+MAP_LIMIT = 5000
+
+# Search terms without regex metacharacters are matched as plain substrings (much faster than re)
+REGEX_CHARS = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+def search_names(df, search_term):
+    if REGEX_CHARS.search(search_term):
+        try:
+            return df['Name'].str.contains(re.compile(search_term, re.IGNORECASE), na=False)
+        except re.error:
+            pass  # Not a valid pattern, fall back to a literal match
+    # Literal match against the lowercased names cached by load_data
+    return df['_name_lc'].str.contains(search_term.lower(), regex=False, na=False)
+
+# Boolean mask of rows whose category is in selected, looked up by category code.
+# The table has one extra False slot at the end so missing values (code -1) never match
+def category_mask(col, selected):
+    wanted = np.zeros(len(col.cat.categories) + 1, dtype=bool)
+    indexer = col.cat.categories.get_indexer(selected)
+    wanted[indexer[indexer >= 0]] = True
+    return wanted[col.cat.codes.to_numpy()]
+
+# Build the map figure; cached on map_sig (a digest of the filtered rows), _map_df itself is not hashed.
+# The cache is shared across sessions, so it's bounded to the most recent filter sets
+@st.cache_data(max_entries=32)
+def build_map_fig(map_sig, _map_df):
+    # Create a color map for fit ratings
+    color_map = {'★★★': 'green', '★★☆': 'orange', '★☆☆': 'red'}
+
+    # Create the figure
+    fig = go.Figure()
+
+    # Single trace for all ratings, with each marker colored by its fit rating
+    colors = _map_df['Fit Rating'].astype(object).map(color_map).fillna('gray').to_numpy()
+
+    fig.add_trace(go.Scattermapbox(
+        lat=_map_df['Latitude'],
+        lon=_map_df['Longitude'],
+        mode='markers',
+        marker=go.scattermapbox.Marker(
+            size=10,
+            color=colors,
+        ),
+        text=_map_df['Name'],
+        hoverinfo='text',
+        customdata=_map_df[['City', 'State', 'Institution Type', 'Fit Rating']].to_numpy(),
+        hovertemplate=(
+            "<b>%{text}</b><br>" +
+            "%{customdata[0]}, %{customdata[1]}<br>" +
+            "%{customdata[2]}<br>" +
+            "Fit Rating: %{customdata[3]}<br>" +
+            "<extra></extra>"
+        )
+    ))
+
+    # Update the layout
+    fig.update_layout(
+        mapbox_style="open-street-map",
+        mapbox=dict(
+            center=dict(lat=_map_df['Latitude'].mean(), lon=_map_df['Longitude'].mean()),
+            zoom=3
+        ),
+        showlegend=False,
+        height=600,
+        margin={"r":0,"t":0,"l":0,"b":0}
+    )
+
+    return fig
 
 # Load the data
 try:
-    df = load_data()
+    df, fit_ratings, institution_types, states = load_data()
 except Exception as e:
     st.error(f"Error loading data: {str(e)}")
     st.stop()
@@ -39,78 +140,55 @@ st.write('Explore institutions based on their Fit Rating for Accessible Excellen
 # Sidebar for filters
 st.sidebar.header('Filters')
 
-# Fit Rating filter
-fit_ratings = df['Fit Rating'].unique()
-selected_ratings = st.sidebar.multiselect('Select Fit Ratings', fit_ratings, default=fit_ratings)
+# Filters are grouped in a form so changing a multiselect or typing in the search box
+# doesn't rerun the whole app until Apply is pressed
+with st.sidebar.form('filters'):
+    # Fit Rating filter
+    selected_ratings = st.multiselect('Select Fit Ratings', fit_ratings, default=fit_ratings)
+
+    # Institution Type filter
+    selected_types = st.multiselect('Select Institution Types', institution_types, default=institution_types)
 
-# Institution Type filter
-institution_types = df['Institution Type'].unique()
-selected_types = st.sidebar.multiselect('Select Institution Types', institution_types, default=institution_types)
+    # State filter
+    selected_states = st.multiselect('Select States', states, default=[])
 
-# State filter
-states = sorted(df['State'].unique())
-selected_states = st.sidebar.multiselect('Select States', states, default=[])
+    # Search box
+    search_term = st.text_input('Search for an institution')
 
-# Search box
-search_term = st.sidebar.text_input('Search for an institution')
+    st.form_submit_button('Apply')
 
-# Filter the dataframe
-filtered_df = df[
-    (df['Fit Rating'].isin(selected_ratings)) &
-    (df['Institution Type'].isin(selected_types)) &
-    (df['Name'].str.contains(search_term, case=False, na=False))
-]
+# Filter the dataframe (all masks are combined before indexing once)
+mask = (
+    category_mask(df['Fit Rating'], selected_ratings) &
+    category_mask(df['Institution Type'], selected_types) &
+    search_names(df, search_term).to_numpy()
+)
 
 if selected_states:
-    filtered_df = filtered_df[filtered_df['State'].isin(selected_states)]
+    mask &= category_mask(df['State'], selected_states)
+
+filtered_df = df[mask]
 
 # Map visualization
 st.subheader('Institution Locations')
 
-# Create a color map for fit ratings
-color_map = {'★★★': 'green', '★★☆': 'orange', '★☆☆': 'red'}
+# The plotted rows only depend on filtered_df, so reuse the last figure while its rows are unchanged
+map_sig = int(pd.util.hash_pandas_object(filtered_df.index, index=False).sum())
+if st.session_state.get('map_sig') != map_sig or 'map_fig' not in st.session_state:
+    # Filter out rows with missing lat/long
+    map_df = filtered_df[filtered_df['_has_coord']]
+    st.session_state['map_total'] = len(map_df)
 
-# Filter out rows with missing lat/long
-map_df = filtered_df.dropna(subset=['Latitude', 'Longitude'])
+    # Keep the map responsive for large result sets by plotting a deterministic sample
+    if len(map_df) > MAP_LIMIT:
+        map_df = map_df.sample(n=MAP_LIMIT, random_state=0)
 
-# Create the figure
-fig = go.Figure()
+    st.session_state['map_fig'] = build_map_fig(map_sig, map_df)
+    st.session_state['map_sig'] = map_sig
+fig = st.session_state['map_fig']
 
-# Add traces for each fit rating
-for rating in map_df['Fit Rating'].unique():
-    df_rating = map_df[map_df['Fit Rating'] == rating]
-    
-    fig.add_trace(go.Scattermapbox(
-        lat=df_rating['Latitude'],
-        lon=df_rating['Longitude'],
-        mode='markers',
-        marker=go.scattermapbox.Marker(
-            size=10,
-            color=color_map.get(rating, 'gray'),
-        ),
-        text=df_rating['Name'],
-        hoverinfo='text',
-        customdata=df_rating[['City', 'State', 'Institution Type', 'Fit Rating']],
-        hovertemplate=(
-            "<b>%{text}</b><br>" +
-            "%{customdata[0]}, %{customdata[1]}<br>" +
-            "%{customdata[2]}<br>" +
-            "Fit Rating: %{customdata[3]}<br>" +
-            "<extra></extra>"
-        )
-    ))
-
-# Update the layout
-fig.update_layout(
-    mapbox_style="open-street-map",
-    mapbox=dict(
-        center=dict(lat=map_df['Latitude'].mean(), lon=map_df['Longitude'].mean()),
-        zoom=3
-    ),
-    showlegend=False,
-    height=600,
-    margin={"r":0,"t":0,"l":0,"b":0}
-)
+if st.session_state['map_total'] > MAP_LIMIT:
+    st.info(f"Showing {MAP_LIMIT} of {st.session_state['map_total']} locations on the map. Refine the filters to see them all.")
 
 st.plotly_chart(fig, use_container_width=True)
 